@@ -19,6 +19,10 @@ Usage:
 3. Adjust parameters in the dialog if needed
 4. The complete wind vane assembly will be created
 
+Headless use (e.g. batch STL export with FreeCADCmd): import this file and
+call build_wind_vane_shapes(merge=True), which never touches a document or
+the GUI and shares the on-disk shape cache with the macro.
+
 Hardware requirements:
 - AS5600 breakout board
 - 6mm diameter x 3mm thick round neodymium magnet
@@ -26,10 +30,19 @@ Hardware requirements:
 """
 
 import FreeCAD as App
+import Mesh
 import Part
-import math
+import hashlib
+import os
+import tempfile
+import numpy as np
+from functools import lru_cache
 from FreeCAD import Vector
 
+# Progress output only when run as a macro, not when imported (e.g. for batch
+# STL export), since console writes from FreeCAD go through the GUI
+VERBOSE = __name__ == "__main__"
+
 # === Configuration Parameters ===
 # These can be adjusted based on your specific requirements
 
@@ -37,6 +50,7 @@ from FreeCAD import Vector
 SHAFT_DIAMETER = 8.0  # mm - should match bearing inner diameter
 SHAFT_LENGTH = 60.0   # mm - total length of rotating shaft
 SHAFT_BASE_LENGTH = 15.0  # mm - length below bearing
+SHAFT_CLEARANCE = 0.25  # mm - radial clearance of the shaft holes in body and base
 
 # Magnet holder parameters (for AS5600)
 MAGNET_DIAMETER = 6.0  # mm - standard neodymium magnet diameter
@@ -73,27 +87,110 @@ BASE_HEIGHT = 10.0     # mm - height of base
 BEARING_OD = 16.0      # mm - 688ZZ bearing outer diameter
 BEARING_WIDTH = 5.0    # mm - 688ZZ bearing width
 BEARING_CLEARANCE = 0.3  # mm - clearance for bearing fit
+BASE_MOUNT_HOLES = 4   # number of M3 mounting holes (evenly spaced, first at 45°)
 
 # AS5600 sensor positioning
 SENSOR_DISTANCE = 1.0  # mm - distance between magnet and sensor (0.5-3mm optimal)
+PLATFORM_WIDTH = 20.0   # mm - sensor platform (typical AS5600 breakout is ~15x15mm)
+PLATFORM_LENGTH = 20.0  # mm
+PLATFORM_HEIGHT = 3.0   # mm
+
+# Preview mode: build a tessellated Mesh::Feature preview with NumPy instead of
+# OCCT solids. Much faster, but holes and pockets are omitted, so leave this off
+# when exporting parts for printing.
+USE_MESH = False
+MESH_SEGMENTS = 32  # facets around each round part in preview mode
+
+# Rotating parts output: False groups them in a compound of overlapping solids
+# (fast, fine for viewing); True fuses them into one watertight solid, needed
+# to export the rotating assembly as a one-piece STL
+MERGE_ROTATING_PARTS = False
+
+# Fuzzy tolerance for the merge=True fuse - far below print resolution, but
+# lets OCCT skip searching for microscopic intersections
+FUSE_TOLERANCE = 0.01  # mm
+
+# Shared axes - ROT_Y90 turns a Z-aligned primitive onto the +X axis
+ORIGIN = Vector(0, 0, 0)
+AXIS_X = Vector(1, 0, 0)
+AXIS_Y = Vector(0, 1, 0)
+AXIS_Z = Vector(0, 0, 1)
+ROT_Y90 = App.Rotation(AXIS_Y, 90)
+ROT_Y90_MATRIX = np.array([[0, 0, 1], [0, 1, 0], [-1, 0, 0]], dtype=float)
+
+# === Derived Constants ===
+# Computed once from the parameters above, the builders only read these
+
+BODY_Z = SHAFT_LENGTH - 15  # base height shared by vane, arrow, counterweight and body
+VANE_TOP_Z = SHAFT_LENGTH + 5  # top height of vane
+BODY_AXIS_Z = BODY_Z + ARROW_DIAMETER/2  # centre line of the central body
+ARROW_BODY_LENGTH = ARROW_LENGTH - ARROW_TIP_LENGTH
+BODY_RADIUS = max(ARROW_DIAMETER/2 + 2, min(BODY_WIDTH/2, BODY_HEIGHT/2))
+FRONT_LENGTH = BODY_LENGTH * 0.4  # pointed nose cone
+MIDDLE_LENGTH = BODY_LENGTH * 0.3  # full diameter section
+REAR_LENGTH = VANE_OFFSET - MIDDLE_LENGTH + 2  # tapers back to the vane
+REAR_END_RADIUS = VANE_THICKNESS * 1.5
+PLATFORM_Z = -(MAGNET_HOLDER_HEIGHT + SENSOR_DISTANCE + PLATFORM_HEIGHT)
+MAGNET_Z = -MAGNET_HOLDER_HEIGHT + MAGNET_CLEARANCE/2  # reference magnet in its pocket
+SHAFT_HOLE_RADIUS = SHAFT_DIAMETER/2 + SHAFT_CLEARANCE
+SHAFT_HOLE_LENGTH = max(BODY_HEIGHT + 4, BASE_HEIGHT + 2)  # long enough for body and base
 
 # === Helper Functions ===
 
+def _quiet(*args, **kwargs):
+    """Stand-in for print() when VERBOSE is off"""
+
+log = print if VERBOSE else _quiet
+
+@lru_cache(maxsize=None)
+def _cyl(radius, height):
+    """Return a shared cylinder template - always .copy() before modifying"""
+    return Part.makeCylinder(radius, height)
+
+def _polar_pattern(template, count, start_angle=0.0):
+    """Compound of count copies of template spread evenly around the Z axis"""
+    step = 360 / count
+    return Part.Compound([
+        template.rotated(ORIGIN, AXIS_Z, start_angle + i * step) for i in range(count)
+    ])
+
+def _lateral(shape):
+    """The curved side face of a cylinder or cone primitive"""
+    return next(f for f in shape.Faces if not isinstance(f.Surface, Part.Plane))
+
+def _disc(radius, z):
+    """Planar circular face centred on the Z axis at height z"""
+    return Part.Face(Part.Wire(Part.makeCircle(radius, Vector(0, 0, z))))
+
+def _sew_solid(faces):
+    """Sew faces whose seams are known to coincide into one solid, no boolean
+    
+    Raises Part.OCCError if the faces don't close up into a valid solid.
+    """
+    shell = Part.Shell(faces)
+    shell.sewShape()
+    if not shell.isClosed():
+        raise Part.OCCError("sewn shell is not closed")
+    solid = Part.Solid(shell)
+    if solid.Volume < 0:
+        solid.reverse()
+    if not solid.isValid():
+        raise Part.OCCError("sewn solid is not valid")
+    return solid
+
 def create_shaft():
     """Create the main rotating shaft"""
-    shaft = Part.makeCylinder(SHAFT_DIAMETER/2, SHAFT_LENGTH)
-    shaft.translate(Vector(0, 0, 0))
-    return shaft
+    return _cyl(SHAFT_DIAMETER/2, SHAFT_LENGTH).copy()
 
 def create_magnet_holder():
     """Create the magnet holder at the bottom of the shaft"""
     # Main holder body
-    holder = Part.makeCylinder(MAGNET_HOLDER_DIAMETER/2, MAGNET_HOLDER_HEIGHT)
+    holder = _cyl(MAGNET_HOLDER_DIAMETER/2, MAGNET_HOLDER_HEIGHT).copy()
     
     # Magnet pocket (slightly larger than magnet for fit)
     pocket_diameter = MAGNET_DIAMETER + MAGNET_CLEARANCE
     pocket_depth = MAGNET_THICKNESS + MAGNET_CLEARANCE
-    pocket = Part.makeCylinder(pocket_diameter/2, pocket_depth)
+    pocket = _cyl(pocket_diameter/2, pocket_depth).copy()
     pocket.translate(Vector(0, 0, MAGNET_HOLDER_HEIGHT - pocket_depth))
     
     # Subtract pocket from holder
@@ -104,23 +201,23 @@ def create_magnet_holder():
     
     return holder
 
-def create_wind_vane():
-    """Create the wind vane (tail fin) - vertical airfoil-shaped"""
+def _vane_corners():
+    """Corners of the vane profile, counter-clockwise seen from +Y"""
     # Create a vertical tapered vane shape (in XZ plane)
     # The vane should be vertical to catch the wind
-    vane_base_z = SHAFT_LENGTH - 15  # Base height of vane
-    vane_top_z = SHAFT_LENGTH + 5    # Top height of vane
-    
-    points = [
-        Vector(VANE_OFFSET, 0, vane_base_z),
-        Vector(VANE_OFFSET, 0, vane_top_z),
-        Vector(VANE_OFFSET + VANE_LENGTH, 0, vane_top_z - 5),
-        Vector(VANE_OFFSET + VANE_LENGTH, 0, vane_base_z + 5),
-        Vector(VANE_OFFSET, 0, vane_base_z)
+    return [
+        (VANE_OFFSET, 0, BODY_Z),
+        (VANE_OFFSET, 0, VANE_TOP_Z),
+        (VANE_OFFSET + VANE_LENGTH, 0, VANE_TOP_Z - 5),
+        (VANE_OFFSET + VANE_LENGTH, 0, BODY_Z + 5)
     ]
+
+def create_wind_vane():
+    """Create the wind vane (tail fin) - vertical airfoil-shaped"""
+    corners = _vane_corners()
     
-    # Create the face
-    wire = Part.makePolygon(points)
+    # Create the face (repeating the first corner closes the wire)
+    wire = Part.makePolygon(corners + corners[:1])
     face = Part.Face(wire)
     
     # Extrude to thickness (in Y direction to make it a vertical fin)
@@ -132,91 +229,84 @@ def create_wind_vane():
 
 def create_arrow_pointer():
     """Create the arrow pointer - 3D cylindrical design"""
-    arrow_z = SHAFT_LENGTH - 15  # Match vane base height
+    # Built along a local Z axis: conical tip from z=0, then the cylindrical
+    # body from the end of the tip to ARROW_LENGTH
+    arrow_radius = ARROW_DIAMETER/2
+    tip_radius = 0.5  # Tip radius (sharp point)
+    
+    # Create a conical tip
+    arrow_tip = Part.makeCone(arrow_radius, tip_radius, ARROW_TIP_LENGTH)
     
     # Create a cylindrical arrow body
-    arrow_body_length = ARROW_LENGTH - ARROW_TIP_LENGTH
-    arrow_body = Part.makeCylinder(ARROW_DIAMETER/2, arrow_body_length)
-    arrow_body.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)  # Align with X axis
-    arrow_body.translate(Vector(-arrow_body_length, 0, arrow_z))
+    arrow_body = _cyl(arrow_radius, ARROW_BODY_LENGTH).translated(Vector(0, 0, ARROW_TIP_LENGTH))
     
-    # Create a conical tip
-    arrow_tip = Part.makeCone(
-        ARROW_DIAMETER/2,  # Base radius
-        0.5,  # Tip radius (sharp point)
-        ARROW_TIP_LENGTH
-    )
-    arrow_tip.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)  # Point forward
-    arrow_tip.translate(Vector(-ARROW_LENGTH, 0, arrow_z))
+    # The body's end cap is a ring around the narrow end of the tip
+    seam = Part.Face([
+        Part.Wire(Part.makeCircle(arrow_radius, Vector(0, 0, ARROW_TIP_LENGTH))),
+        Part.Wire(Part.makeCircle(tip_radius, Vector(0, 0, ARROW_TIP_LENGTH)))
+    ])
     
-    # Combine body and tip
-    arrow = arrow_body.fuse(arrow_tip)
+    # Sew body and tip together along their known seams
+    try:
+        arrow = _sew_solid([
+            _disc(arrow_radius, 0),
+            _lateral(arrow_tip),
+            seam,
+            _lateral(arrow_body),
+            _disc(arrow_radius, ARROW_LENGTH)
+        ])
+    except Part.OCCError:
+        # Fallback to a boolean fuse
+        arrow = arrow_body.fuse(arrow_tip)
+    arrow.Placement = App.Placement(Vector(-ARROW_LENGTH, 0, BODY_Z), ROT_Y90)  # Point forward
     
     return arrow
 
 def create_counterweight():
     """Create a counterweight to balance the vane"""
-    arrow_z = SHAFT_LENGTH - 15  # Same height as arrow/vane
-    
-    # Create cylindrical counterweight
-    counterweight = Part.makeCylinder(
+    # Create cylindrical counterweight at the same height as arrow/vane
+    counterweight = _cyl(
         COUNTERWEIGHT_DIAMETER/2,
         COUNTERWEIGHT_LENGTH
-    )
-    counterweight.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)
-    counterweight.translate(Vector(-COUNTERWEIGHT_DISTANCE - COUNTERWEIGHT_LENGTH, 0, arrow_z))
+    ).copy()
+    counterweight.Placement = App.Placement(Vector(-COUNTERWEIGHT_DISTANCE - COUNTERWEIGHT_LENGTH, 0, BODY_Z), ROT_Y90)
     
     return counterweight
 
 def create_central_body():
     """Create the central body/hub - streamlined aerodynamic shape"""
-    body_z = SHAFT_LENGTH - 15  # Same base as arrow/vane
-    
     # Create a streamlined body using a tapered cone design
     # No egg shape - just clean aerodynamic lines
-    
-    # Main body dimensions
-    body_radius = max(ARROW_DIAMETER/2 + 2, min(BODY_WIDTH/2, BODY_HEIGHT/2))
-    
-    # Front cone (pointed nose) - from arrow back to full width
-    front_length = BODY_LENGTH * 0.4
-    front_nose = Part.makeCone(
-        0.5,  # Sharp nose tip
-        body_radius,  # Full body radius at back
-        front_length
-    )
-    front_nose.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)  # Point forward
-    front_nose.translate(Vector(-front_length, 0, body_z + ARROW_DIAMETER/2))
-    
-    # Middle section - full diameter cylinder
-    middle_length = BODY_LENGTH * 0.3
-    middle = Part.makeCylinder(body_radius, middle_length)
-    middle.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)
-    middle.translate(Vector(0, 0, body_z + ARROW_DIAMETER/2))
-    
-    # Rear cone - tapers back to connect with vane
-    rear_length = VANE_OFFSET - middle_length + 2
-    rear_end_radius = VANE_THICKNESS * 1.5
-    rear = Part.makeCone(
-        body_radius,
-        rear_end_radius,
-        rear_length
-    )
-    rear.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)
-    rear.translate(Vector(middle_length, 0, body_z + ARROW_DIAMETER/2))
-    
-    # Combine all sections
-    try:
-        body = front_nose.fuse([middle, rear])
-    except:
+    body = None
+    # Skip building the body entirely when a section would be degenerate
+    if FRONT_LENGTH > 0 and MIDDLE_LENGTH > 0 and REAR_LENGTH > 0 and BODY_RADIUS > 0:
+        # Half profile in the XZ plane (x along the body, z = radius), revolved
+        # about the X axis - three co-axial sections in a single solid
+        rear_start = FRONT_LENGTH + MIDDLE_LENGTH
+        rear_end = rear_start + REAR_LENGTH
+        profile = [
+            (0, 0, 0),
+            (0, 0, 0.5),  # Sharp nose tip
+            (FRONT_LENGTH, 0, BODY_RADIUS),  # Front cone - back to full width
+            (rear_start, 0, BODY_RADIUS),  # Middle section - full diameter
+            (rear_end, 0, REAR_END_RADIUS),  # Rear cone - tapers back to the vane
+            (rear_end, 0, 0)
+        ]
+        try:
+            face = Part.Face(Part.makePolygon(profile + profile[:1]))
+            body = face.revolve(ORIGIN, AXIS_X, 360)
+            body.translate(Vector(-FRONT_LENGTH, 0, BODY_AXIS_Z))
+        except Part.OCCError:
+            body = None
+    
+    if body is None:
         # Fallback to simple shape
-        body = Part.makeCylinder(body_radius, BODY_LENGTH)
-        body.rotate(Vector(0, 0, 0), Vector(0, 1, 0), 90)
-        body.translate(Vector(-BODY_LENGTH/2, 0, body_z + ARROW_DIAMETER/2))
+        body = _cyl(BODY_RADIUS, BODY_LENGTH).copy()
+        body.Placement = App.Placement(Vector(-BODY_LENGTH/2, 0, BODY_AXIS_Z), ROT_Y90)
     
-    # Create a hole for the shaft
-    shaft_hole = Part.makeCylinder(SHAFT_DIAMETER/2 + 0.1, BODY_HEIGHT + 4)
-    shaft_hole.translate(Vector(0, 0, body_z + ARROW_DIAMETER/2 - BODY_HEIGHT/2 - 2))
+    # Create a hole for the shaft, centred on the body axis
+    shaft_hole = _cyl(SHAFT_HOLE_RADIUS, SHAFT_HOLE_LENGTH).copy()
+    shaft_hole.translate(Vector(0, 0, BODY_AXIS_Z - SHAFT_HOLE_LENGTH/2))
     
     # Subtract the shaft hole
     body = body.cut(shaft_hole)
@@ -226,160 +316,392 @@ def create_central_body():
 def create_base_mount():
     """Create the base mount with bearing housing"""
     # Main base cylinder
-    base = Part.makeCylinder(BASE_DIAMETER/2, BASE_HEIGHT)
+    base = _cyl(BASE_DIAMETER/2, BASE_HEIGHT).copy()
     base.translate(Vector(0, 0, -BASE_HEIGHT))
     
     # Bearing housing hole
     bearing_hole_depth = BASE_HEIGHT/2 + 1
-    bearing_hole = Part.makeCylinder(
+    bearing_hole = _cyl(
         (BEARING_OD + BEARING_CLEARANCE)/2, 
         bearing_hole_depth
-    )
+    ).copy()
     bearing_hole.translate(Vector(0, 0, -bearing_hole_depth))
     
-    # Through hole for shaft
-    shaft_hole = Part.makeCylinder(
-        (SHAFT_DIAMETER + 0.5)/2,  # Slight clearance
-        BASE_HEIGHT + 2
-    )
-    shaft_hole.translate(Vector(0, 0, -BASE_HEIGHT - 1))
+    # Through hole for shaft, centred on the base - same template as the body's
+    shaft_hole = _cyl(SHAFT_HOLE_RADIUS, SHAFT_HOLE_LENGTH).copy()
+    shaft_hole.translate(Vector(0, 0, -BASE_HEIGHT/2 - SHAFT_HOLE_LENGTH/2))
     
-    # Mounting holes (4 holes at 45° angles)
-    mounting_holes = []
+    # Mounting holes (evenly spaced, starting at 45°)
     hole_diameter = 3.5  # M3 screw
     hole_radius = BASE_DIAMETER/2 - 8
+    hole = _cyl(hole_diameter/2, BASE_HEIGHT + 2).copy()
+    hole.translate(Vector(hole_radius, 0, -BASE_HEIGHT - 1))
+    mounting_holes = _polar_pattern(hole, BASE_MOUNT_HOLES, 45)
     
-    for angle in [45, 135, 225, 315]:
-        rad = math.radians(angle)
-        x = hole_radius * math.cos(rad)
-        y = hole_radius * math.sin(rad)
-        hole = Part.makeCylinder(hole_diameter/2, BASE_HEIGHT + 2)
-        hole.translate(Vector(x, y, -BASE_HEIGHT - 1))
-        mounting_holes.append(hole)
-    
-    # Subtract all holes
-    base = base.cut(bearing_hole)
-    base = base.cut(shaft_hole)
-    for hole in mounting_holes:
-        base = base.cut(hole)
+    # Subtract all holes in a single boolean operation
+    base = base.cut([bearing_hole, shaft_hole, mounting_holes])
     
     return base
 
 def create_sensor_mount_area():
     """Create a platform for mounting the AS5600 breakout board"""
-    # Platform dimensions (typical AS5600 breakout is ~15x15mm)
-    platform_width = 20.0
-    platform_length = 20.0
-    platform_height = 3.0
-    
-    platform = Part.makeBox(platform_length, platform_width, platform_height)
-    platform.translate(Vector(
-        -platform_length/2,
-        -platform_width/2,
-        -(MAGNET_HOLDER_HEIGHT + SENSOR_DISTANCE + platform_height)
-    ))
+    platform = Part.makeBox(PLATFORM_LENGTH, PLATFORM_WIDTH, PLATFORM_HEIGHT)
+    platform.translate(Vector(-PLATFORM_LENGTH/2, -PLATFORM_WIDTH/2, PLATFORM_Z))
     
     # Mounting holes for sensor board (2.54mm pitch)
     hole_spacing = 12.7  # Common spacing for breakout boards
     hole_diameter = 2.0  # For M2 screws or pins
     
-    holes_positions = [
-        (-hole_spacing/2, -hole_spacing/2),
-        (hole_spacing/2, -hole_spacing/2),
-        (-hole_spacing/2, hole_spacing/2),
-        (hole_spacing/2, hole_spacing/2)
-    ]
+    # A square hole grid is a 4-fold polar pattern of one corner hole
+    hole = _cyl(hole_diameter/2, PLATFORM_HEIGHT + 1).copy()
+    hole.translate(Vector(hole_spacing/2, hole_spacing/2, PLATFORM_Z - 0.5))
+    holes = _polar_pattern(hole, 4)
     
-    for x, y in holes_positions:
-        hole = Part.makeCylinder(hole_diameter/2, platform_height + 1)
-        hole.translate(Vector(x, y, -(MAGNET_HOLDER_HEIGHT + SENSOR_DISTANCE + platform_height) - 0.5))
-        platform = platform.cut(hole)
+    # Subtract all holes in a single boolean operation
+    platform = platform.cut(holes)
     
     return platform
 
-# === Main Assembly Function ===
+# === Mesh Preview ===
+# Every part is a cylinder, cone or four-sided prism, so the preview is
+# triangulated directly with NumPy and OCCT is never invoked.
+# A mesh is a (verts, tris) pair of float (N, 3) and int (M, 3) arrays.
 
-def create_wind_vane_assembly():
-    """Create the complete wind vane assembly"""
-    doc = App.ActiveDocument
-    if doc is None:
-        doc = App.newDocument("WindVane")
-    
-    print("Creating Wind Vane for AS5600...")
-    
-    # Create all components
-    print("- Creating shaft...")
-    shaft = create_shaft()
-    
-    print("- Creating magnet holder...")
-    magnet_holder = create_magnet_holder()
-    
-    print("- Creating wind vane...")
-    vane = create_wind_vane()
+def _cyl_tris_loop(n):
+    """Loop form of the _cyl_tris() table, compiled with numba when available"""
+    tris = np.empty((4*n, 3), dtype=np.int32)
+    for i in range(n):
+        j = (i + 1) % n
+        tris[i, 0], tris[i, 1], tris[i, 2] = i, j, n + j
+        tris[n + i, 0], tris[n + i, 1], tris[n + i, 2] = i, n + j, n + i
+        tris[2*n + i, 0], tris[2*n + i, 1], tris[2*n + i, 2] = 2*n, j, i
+        tris[3*n + i, 0], tris[3*n + i, 1], tris[3*n + i, 2] = 2*n + 1, n + i, n + j
+    return tris
+
+@lru_cache(maxsize=None)
+def _cyl_tris_jit():
+    """Return _cyl_tris_loop compiled with numba, or None without numba
     
-    print("- Creating arrow pointer...")
-    arrow = create_arrow_pointer()
+    numba is optional and only imported here, on the first preview build,
+    so the default OCCT path never pays for loading it.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    # cache=True needs a source file, which a macro pasted into the console lacks
+    return njit(cache=os.path.isfile(globals().get("__file__", "")))(_cyl_tris_loop)
+
+@lru_cache(maxsize=None)
+def _cyl_tris(n):
+    """Triangle table for an n-segment capped frustum (see _cone_mesh)"""
+    compiled = _cyl_tris_jit()
+    if compiled is not None:
+        return compiled(n)
+    i = np.arange(n, dtype=np.int32)
+    j = (i + 1) % n
+    bottom = np.full(n, 2*n, dtype=np.int32)
+    top = np.full(n, 2*n + 1, dtype=np.int32)
+    return np.concatenate([
+        np.stack([i, j, n + j], axis=1),      # side
+        np.stack([i, n + j, n + i], axis=1),  # side
+        np.stack([bottom, j, i], axis=1),     # bottom cap
+        np.stack([top, n + i, n + j], axis=1)  # top cap
+    ])
+
+def _cone_mesh(r1, r2, height, n=MESH_SEGMENTS):
+    """Z-aligned frustum from radius r1 at z=0 to radius r2 at z=height"""
+    theta = np.linspace(0, 2*np.pi, n, endpoint=False)
+    ring = np.stack([np.cos(theta), np.sin(theta), np.zeros(n)], axis=1)
+    verts = np.concatenate([
+        ring * r1,
+        ring * r2 + (0, 0, height),
+        [(0, 0, 0), (0, 0, height)]  # cap centres
+    ])
+    return verts, _cyl_tris(n)
+
+def _cyl_mesh(radius, height, n=MESH_SEGMENTS):
+    """Z-aligned cylinder from z=0 to z=height"""
+    return _cone_mesh(radius, radius, height, n)
+
+def _prism_mesh(corners, direction):
+    """Four corners (counter-clockwise seen from direction) extruded along it"""
+    base = np.asarray(corners, dtype=float)
+    verts = np.concatenate([base, base + direction])
+    tris = np.array([
+        (0, 2, 1), (0, 3, 2),  # base
+        (4, 5, 6), (4, 6, 7),  # top
+        (0, 1, 5), (0, 5, 4), (1, 2, 6), (1, 6, 5),
+        (2, 3, 7), (2, 7, 6), (3, 0, 4), (3, 4, 7)
+    ])
+    return verts, tris
+
+def _placed(mesh, offset, rotation=None):
+    """Return mesh rotated by a 3x3 matrix (if given), then translated"""
+    verts, tris = mesh
+    if rotation is not None:
+        verts = verts @ rotation.T
+    return verts + offset, tris
+
+def _to_mesh(*meshes):
+    """Concatenate meshes and convert them to a single Mesh.Mesh"""
+    verts, tris, offset = [], [], 0
+    for v, t in meshes:
+        verts.append(v)
+        tris.append(t + offset)
+        offset += len(v)
+    verts = np.concatenate(verts)
+    tris = np.concatenate(tris)
+    # Mesh.Mesh takes a flat point list, every three points form a facet
+    return Mesh.Mesh(verts[tris].reshape(-1, 3).tolist())
+
+def build_wind_vane_meshes():
+    """Build preview meshes for the rotating assembly, base and sensor mount
+    
+    The outer envelope matches build_wind_vane_shapes(), but holes, pockets
+    and the shaft clearance are not cut.
+    """
+    rotating_assembly = _to_mesh(
+        _cyl_mesh(SHAFT_DIAMETER/2, SHAFT_LENGTH),
+        _placed(_cyl_mesh(MAGNET_HOLDER_DIAMETER/2, MAGNET_HOLDER_HEIGHT),
+                (0, 0, -MAGNET_HOLDER_HEIGHT)),
+        _placed(_prism_mesh(_vane_corners(), (0, VANE_THICKNESS, 0)),
+                (0, -VANE_THICKNESS/2, 0)),
+        _placed(_cyl_mesh(ARROW_DIAMETER/2, ARROW_BODY_LENGTH),
+                (-ARROW_BODY_LENGTH, 0, BODY_Z), ROT_Y90_MATRIX),
+        _placed(_cone_mesh(ARROW_DIAMETER/2, 0.5, ARROW_TIP_LENGTH),
+                (-ARROW_LENGTH, 0, BODY_Z), ROT_Y90_MATRIX),
+        _placed(_cyl_mesh(COUNTERWEIGHT_DIAMETER/2, COUNTERWEIGHT_LENGTH),
+                (-COUNTERWEIGHT_DISTANCE - COUNTERWEIGHT_LENGTH, 0, BODY_Z), ROT_Y90_MATRIX),
+        _placed(_cone_mesh(0.5, BODY_RADIUS, FRONT_LENGTH),
+                (-FRONT_LENGTH, 0, BODY_AXIS_Z), ROT_Y90_MATRIX),
+        _placed(_cyl_mesh(BODY_RADIUS, MIDDLE_LENGTH),
+                (0, 0, BODY_AXIS_Z), ROT_Y90_MATRIX),
+        _placed(_cone_mesh(BODY_RADIUS, REAR_END_RADIUS, REAR_LENGTH),
+                (MIDDLE_LENGTH, 0, BODY_AXIS_Z), ROT_Y90_MATRIX)
+    )
     
-    print("- Creating counterweight...")
-    counterweight = create_counterweight()
+    base = _to_mesh(_placed(_cyl_mesh(BASE_DIAMETER/2, BASE_HEIGHT), (0, 0, -BASE_HEIGHT)))
     
-    print("- Creating central body...")
-    body = create_central_body()
+    sensor_mount = _to_mesh(_prism_mesh([
+        (-PLATFORM_LENGTH/2, -PLATFORM_WIDTH/2, PLATFORM_Z),
+        (PLATFORM_LENGTH/2, -PLATFORM_WIDTH/2, PLATFORM_Z),
+        (PLATFORM_LENGTH/2, PLATFORM_WIDTH/2, PLATFORM_Z),
+        (-PLATFORM_LENGTH/2, PLATFORM_WIDTH/2, PLATFORM_Z)
+    ], (0, 0, PLATFORM_HEIGHT)))
     
-    print("- Creating base mount...")
-    base = create_base_mount()
+    return rotating_assembly, base, sensor_mount
+
+# === Shape Cache ===
+# Built shapes are stored as BREP keyed by the parameters, so re-running the
+# macro with unchanged settings skips all OCCT work. Set WINDVANE_NOCACHE=1
+# to always rebuild.
+
+CACHE_DIR = os.path.expanduser("~/.FreeCAD/cache/windvane")
+
+# Settings that do not change the cached BREP shapes
+CACHE_IGNORED = {"MESH_SEGMENTS"}
+
+def _cache_key(merge):
+    """Hash the parameters and macro source the geometry depends on
+    
+    Returns None when the source can't be read (e.g. a macro pasted into the
+    console), since a key without it would go stale when a builder changes.
+    """
+    source = globals().get("__file__")
+    if not source or not os.path.isfile(source):
+        return None
+    params = sorted((k, v) for k, v in globals().items()
+                    if k.isupper() and type(v) in (int, float)
+                    and k not in CACHE_IGNORED)
+    digest = hashlib.sha1(repr((params, merge)).encode())
+    try:
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def _load_cached_shapes(key, count):
+    """Return the cached shapes for key, or None on a cache miss"""
+    path = os.path.join(CACHE_DIR, key + ".brep")
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path) as f:
+            compound = Part.Shape()
+            compound.importBrepFromString(f.read())
+    except (OSError, Part.OCCError):
+        return None
+    shapes = compound.childShapes()
+    return shapes if len(shapes) == count else None
+
+def _store_cached_shapes(key, shapes):
+    """Write shapes to the cache - a failed write only costs a rebuild"""
+    # Write to a temp file and rename it into place, so a concurrent run
+    # never reads a half-written entry
+    tmp = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=CACHE_DIR)
+        with os.fdopen(fd, "w") as f:
+            f.write(Part.Compound(shapes).exportBrepToString())
+        os.replace(tmp, os.path.join(CACHE_DIR, key + ".brep"))
+    except OSError:
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+# === Main Assembly Function ===
+
+def _build_shapes(merge):
+    """Build the rotating assembly, base mount and sensor mount shapes"""
+    builders = [
+        ("shaft", create_shaft),
+        ("magnet holder", create_magnet_holder),
+        ("wind vane", create_wind_vane),
+        ("arrow pointer", create_arrow_pointer),
+        ("counterweight", create_counterweight),
+        ("central body", create_central_body),
+        ("base mount", create_base_mount),
+        ("sensor mount", create_sensor_mount_area)
+    ]
     
-    print("- Creating sensor mount...")
-    sensor_mount = create_sensor_mount_area()
+    # Create all components
+    parts = []
+    for name, builder in builders:
+        log(f"- Creating {name}...")
+        parts.append(builder())
+    shaft, magnet_holder, vane, arrow, counterweight, body, base, sensor_mount = parts
     
     # Combine rotating parts
-    rotating_assembly = shaft.fuse([magnet_holder, vane, arrow, counterweight, body])
-    
-    # Add components to document
-    obj_rotating = doc.addObject("Part::Feature", "RotatingAssembly")
-    obj_rotating.Shape = rotating_assembly
-    obj_rotating.ViewObject.ShapeColor = (0.8, 0.8, 0.9)  # Light blue
-    
-    obj_base = doc.addObject("Part::Feature", "BaseMounting")
-    obj_base.Shape = base
-    obj_base.ViewObject.ShapeColor = (0.7, 0.7, 0.7)  # Gray
+    if merge:
+        # One n-ary fuse of every tool, not a chain of pairwise fuses
+        rotating_assembly = shaft.fuse([magnet_holder, vane, arrow, counterweight, body], FUSE_TOLERANCE)
+    else:
+        rotating_assembly = Part.Compound([shaft, magnet_holder, vane, arrow, counterweight, body])
     
-    obj_sensor = doc.addObject("Part::Feature", "SensorMount")
-    obj_sensor.Shape = sensor_mount
-    obj_sensor.ViewObject.ShapeColor = (0.9, 0.7, 0.5)  # Tan
+    return rotating_assembly, base, sensor_mount
+
+def build_wind_vane_shapes(merge=False):
+    """Return the rotating assembly, base mount and sensor mount shapes
+    
+    A previous build with the same settings is loaded from the shape cache.
+    """
+    key = _cache_key(merge)
+    use_cache = key is not None and os.environ.get("WINDVANE_NOCACHE") != "1"
+    shapes = _load_cached_shapes(key, 3) if use_cache else None
+    if shapes is not None:
+        log("- Loaded shapes from cache")
+        return tuple(shapes)
+    shapes = _build_shapes(merge)
+    if use_cache:
+        _store_cached_shapes(key, shapes)
+    return shapes
+
+def _add_feature(doc, name, geometry):
+    """Add a Part::Feature for a shape or a Mesh::Feature for a mesh"""
+    if isinstance(geometry, Mesh.Mesh):
+        obj = doc.addObject("Mesh::Feature", name)
+        obj.Mesh = geometry
+    else:
+        obj = doc.addObject("Part::Feature", name)
+        obj.Shape = geometry
+    return obj
+
+def _style(obj, color, transparency=0):
+    """Set display colour and transparency - a no-op without the GUI"""
+    if not App.GuiUp:
+        return
+    view = obj.ViewObject
+    view.ShapeColor = color
+    if transparency:
+        view.Transparency = transparency
+
+def create_wind_vane_assembly(merge=None):
+    """Create the complete wind vane assembly
+    
+    merge defaults to MERGE_ROTATING_PARTS. When False the rotating parts
+    are grouped in a compound, which is all the viewer needs. When True they
+    are fused into one watertight solid, e.g. for exporting a one-piece STL.
+    With USE_MESH set, a tessellated preview is created instead and merge is
+    ignored.
+    """
+    if merge is None:
+        merge = MERGE_ROTATING_PARTS
     
-    # Add reference magnet (for visualization)
-    magnet_viz = Part.makeCylinder(MAGNET_DIAMETER/2, MAGNET_THICKNESS)
-    magnet_viz.translate(Vector(0, 0, -MAGNET_HOLDER_HEIGHT + MAGNET_CLEARANCE/2))
-    obj_magnet = doc.addObject("Part::Feature", "Magnet_Reference")
-    obj_magnet.Shape = magnet_viz
-    obj_magnet.ViewObject.ShapeColor = (0.1, 0.1, 0.1)  # Dark (magnet)
-    obj_magnet.ViewObject.Transparency = 50
+    doc = App.ActiveDocument
+    if doc is None:
+        doc = App.newDocument("WindVane")
     
-    doc.recompute()
-    App.ActiveDocument.recompute()
+    log("Creating Wind Vane for AS5600...")
+    
+    if USE_MESH:
+        log("- Creating mesh preview...")
+        rotating_assembly, base, sensor_mount = build_wind_vane_meshes()
+        magnet_viz = _to_mesh(_placed(
+            _cyl_mesh(MAGNET_DIAMETER/2, MAGNET_THICKNESS), (0, 0, MAGNET_Z)
+        ))
+    else:
+        rotating_assembly, base, sensor_mount = build_wind_vane_shapes(merge)
+        
+        magnet_viz = _cyl(MAGNET_DIAMETER/2, MAGNET_THICKNESS).copy()
+        magnet_viz.translate(Vector(0, 0, MAGNET_Z))
+    
+    # Add components to document as a single undo step
+    doc.openTransaction("BuildWindVane")
+    try:
+        obj_rotating = _add_feature(doc, "RotatingAssembly", rotating_assembly)
+        _style(obj_rotating, (0.8, 0.8, 0.9))  # Light blue
+        
+        obj_base = _add_feature(doc, "BaseMounting", base)
+        _style(obj_base, (0.7, 0.7, 0.7))  # Gray
+        
+        obj_sensor = _add_feature(doc, "SensorMount", sensor_mount)
+        _style(obj_sensor, (0.9, 0.7, 0.5))  # Tan
+        
+        # Add reference magnet (for visualization)
+        obj_magnet = _add_feature(doc, "Magnet_Reference", magnet_viz)
+        _style(obj_magnet, (0.1, 0.1, 0.1), transparency=50)  # Dark (magnet)
+        
+        # One recompute once every object is in place
+        doc.recompute()
+    except Exception:
+        # Drop the half-built objects instead of leaving a partial assembly
+        doc.abortTransaction()
+        raise
+    doc.commitTransaction()
     
     # Fit view
-    try:
+    if App.GuiUp:
         import FreeCADGui
         FreeCADGui.SendMsgToActiveView("ViewFit")
-    except:
-        pass
-    
-    print("\n=== Wind Vane Assembly Complete ===")
-    print(f"Shaft diameter: {SHAFT_DIAMETER}mm")
-    print(f"Magnet: {MAGNET_DIAMETER}mm x {MAGNET_THICKNESS}mm (round neodymium)")
-    print(f"Bearing: 688ZZ ({SHAFT_DIAMETER}mm ID, {BEARING_OD}mm OD, {BEARING_WIDTH}mm width)")
-    print(f"Sensor clearance: {SENSOR_DISTANCE}mm")
-    print(f"\nThe arrow points INTO the wind direction.")
-    print(f"The vane (tail) will be blown downwind.")
-    print("\nNext steps:")
-    print("1. Export STL files for 3D printing")
-    print("2. Install 688ZZ bearing in base")
-    print("3. Insert round neodymium magnet into holder")
-    print("4. Mount AS5600 breakout board on sensor mount")
-    print("5. Ensure magnet-to-sensor distance is 0.5-3mm")
-    print("6. Adjust counterweight if needed for balance")
+    
+    if USE_MESH:
+        export_step = "1. Set USE_MESH = False, then export STL files for 3D printing"
+    elif merge:
+        export_step = "1. Export STL files for 3D printing"
+    else:
+        export_step = ("1. Export STL files for 3D printing (set MERGE_ROTATING_PARTS"
+                       " = True first for a one-piece rotating assembly STL)")
+    log("\n".join([
+        "\n=== Wind Vane Assembly Complete ===",
+        f"Shaft diameter: {SHAFT_DIAMETER}mm",
+        f"Magnet: {MAGNET_DIAMETER}mm x {MAGNET_THICKNESS}mm (round neodymium)",
+        f"Bearing: 688ZZ ({SHAFT_DIAMETER}mm ID, {BEARING_OD}mm OD, {BEARING_WIDTH}mm width)",
+        f"Sensor clearance: {SENSOR_DISTANCE}mm",
+        "\nThe arrow points INTO the wind direction.",
+        "The vane (tail) will be blown downwind.",
+        "\nNext steps:",
+        export_step,
+        "2. Install 688ZZ bearing in base",
+        "3. Insert round neodymium magnet into holder",
+        "4. Mount AS5600 breakout board on sensor mount",
+        "5. Ensure magnet-to-sensor distance is 0.5-3mm",
+        "6. Adjust counterweight if needed for balance"
+    ]))
     
     return doc
 